@@ -5,14 +5,22 @@ Exposes MCP tools via HTTP endpoints compatible with Azure Functions.
 """
 
 import asyncio
-import json
+import atexit
+import base64
+import binascii
 import logging
+import math
 import os
-from dataclasses import dataclass
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import Any
 
 import azure.functions as func
 import httpx
+import orjson
+from azure.core.credentials import AccessToken
 from azure.identity import DefaultAzureCredential
 from pydantic import BaseModel, Field
 
@@ -25,7 +33,11 @@ logger = logging.getLogger(__name__)
 # ============================================================================
 
 class LoanApplicationData(BaseModel):
-    """Extracted loan application data."""
+    """Extracted loan application data.
+
+    Documents the extracted fields; extraction itself fills the lighter
+    ``LoanFields`` carrier below.
+    """
 
     applicant_name: str | None = Field(default=None, description="Full name of the loan applicant")
     ssn_last_4: str | None = Field(default=None, description="Last 4 digits of SSN")
@@ -39,10 +51,54 @@ class LoanApplicationData(BaseModel):
     raw_markdown: str | None = Field(default=None, description="Raw markdown content from document")
 
 
+@dataclass(slots=True)
+class LoanFields:
+    """Internal carrier for extracted loan fields (see LoanApplicationData)."""
+
+    applicant_name: str | None = None
+    ssn_last_4: str | None = None
+    annual_income: float | None = None
+    employment_status: str | None = None
+    employer_name: str | None = None
+    loan_amount_requested: float | None = None
+    loan_purpose: str | None = None
+    property_address: str | None = None
+    confidence_score: float | None = None
+    raw_markdown: str | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the populated fields as a plain dict."""
+        return {
+            name: value
+            for name in self.__slots__
+            if (value := getattr(self, name)) is not None
+        }
+
+
 # ============================================================================
 # Content Understanding Client
 # ============================================================================
 
+_POLL_INITIAL_DELAY = 0.25
+_POLL_MAX_DELAY = 2.0
+_POLL_TIMEOUT = 120.0
+_STATUS_RE = re.compile(rb'"status"\s*:\s*"(\w+)"')
+_RESULT_CACHE_TTL = 600.0
+_RESULT_CACHE_SIZE = 128
+
+
+def _retry_after_seconds(response: httpx.Response) -> float | None:
+    """Parse a Retry-After header in seconds, ignoring negative or non-finite values."""
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        seconds = float(retry_after)
+    except ValueError:
+        return None
+    return seconds if math.isfinite(seconds) and seconds >= 0 else None
+
+
 @dataclass
 class ContentUnderstandingClient:
     """Client for Azure Content Understanding API."""
@@ -50,15 +106,125 @@ class ContentUnderstandingClient:
     endpoint: str
     credential: DefaultAzureCredential
     api_version: str = "2025-11-01"
-
-    def _get_token(self) -> str:
-        """Get access token for Content Understanding API."""
-        token = self.credential.get_token("https://cognitiveservices.azure.com/.default")
-        return token.token
+    _http: httpx.AsyncClient | None = field(default=None, init=False, repr=False)
+    _token: AccessToken | None = field(default=None, init=False, repr=False)
+    _token_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False, repr=False)
+    _result_cache: OrderedDict[str, tuple[float, dict[str, Any]]] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    _inflight: dict[str, asyncio.Task] = field(default_factory=dict, init=False, repr=False)
+
+    def _get_http(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use."""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=120.0,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                http2=True,
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and release pooled connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _get_token(self) -> str:
+        """Get access token for Content Understanding API.
+
+        The token is cached until five minutes before it expires, and the lock
+        keeps concurrent calls from refreshing it more than once. The refresh
+        runs in a worker thread because the credential chain blocks.
+        """
+        async with self._token_lock:
+            if self._token is None or self._token.expires_on - time.time() <= 300:
+                self._token = await asyncio.to_thread(
+                    self.credential.get_token, "https://cognitiveservices.azure.com/.default"
+                )
+            return self._token.token
 
     async def analyze_document(self, document_url: str) -> dict[str, Any]:
-        """Analyze a document using Content Understanding."""
-        token = self._get_token()
+        """Analyze a document using Content Understanding.
+
+        Successful results are cached per URL for ten minutes, and concurrent
+        calls for the same URL share a single analysis.
+        """
+        hit = self._result_cache.get(document_url)
+        if hit is not None:
+            if time.monotonic() - hit[0] < _RESULT_CACHE_TTL:
+                self._result_cache.move_to_end(document_url)
+                return hit[1]
+            del self._result_cache[document_url]
+
+        task = self._inflight.get(document_url)
+        if task is None:
+            task = asyncio.create_task(self._analyze_document(document_url))
+            self._inflight[document_url] = task
+            task.add_done_callback(lambda t: self._finish_analysis(document_url, t))
+        return await asyncio.shield(task)
+
+    def _finish_analysis(self, document_url: str, task: asyncio.Task) -> None:
+        """Record a completed analysis in the result cache."""
+        self._inflight.pop(document_url, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._result_cache[document_url] = (time.monotonic(), task.result())
+        if len(self._result_cache) > _RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+
+    async def _analyze_document(self, document_url: str) -> dict[str, Any]:
+        """Run a Content Understanding analysis for a single document."""
+        logger.info(f"Starting document analysis for: {document_url}")
+        return await self._run_analysis([{"url": document_url}])
+
+    async def analyze_documents(self, document_urls: list[str]) -> list[dict[str, Any]]:
+        """Analyze several documents with a single Content Understanding request.
+
+        Returns the analyzed contents in the same order as ``document_urls``,
+        and raises ValueError if the service returns a different number of
+        contents than documents submitted.
+        """
+        logger.info(f"Starting batch analysis for {len(document_urls)} documents")
+        result = await self._run_analysis([{"url": url} for url in document_urls])
+        contents = result.get("result", {}).get("contents", [])
+        if len(contents) != len(document_urls):
+            raise ValueError(
+                f"Expected {len(document_urls)} analyzed documents, got {len(contents)}"
+            )
+        return contents
+
+    async def start_analysis(self, document_url: str) -> str:
+        """Submit a document for analysis without waiting for it to finish.
+
+        Returns the operation location to pass to ``get_analysis_result``.
+        """
+        logger.info(f"Submitting document analysis for: {document_url}")
+        return await self._submit_analysis([{"url": document_url}])
+
+    def owns_operation(self, operation_location: str) -> bool:
+        """Whether an operation location points at the configured endpoint."""
+        return operation_location.startswith(self.endpoint.rstrip("/") + "/")
+
+    async def get_analysis_result(self, operation_location: str) -> dict[str, Any] | None:
+        """Poll a submitted analysis once.
+
+        Returns the analysis result, or None while the operation is still running.
+        """
+        # Never send our token to a host other than the configured endpoint
+        if not self.owns_operation(operation_location):
+            raise ValueError("Operation location does not belong to the configured endpoint")
+
+        status, payload, _ = await self._poll_once(operation_location)
+        if status == "Succeeded":
+            return orjson.loads(payload)
+        elif status in ("Failed", "Canceled"):
+            raise ValueError(f"Analysis failed with status: {status}")
+        return None
+
+    async def _submit_analysis(self, inputs: list[dict[str, str]]) -> str:
+        """Submit an analysis request and return its operation location."""
+        token = await self._get_token()
 
         analyzer_id = "prebuilt-document"
         analyze_url = f"{self.endpoint}/contentunderstanding/analyzers/{analyzer_id}:analyze"
@@ -69,120 +235,167 @@ class ContentUnderstandingClient:
         }
 
         params = {"api-version": self.api_version}
-        body = {"inputs": [{"url": document_url}]}
-
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            logger.info(f"Starting document analysis for: {document_url}")
-            response = await client.post(
-                analyze_url,
-                headers=headers,
-                params=params,
-                json=body,
-            )
-            response.raise_for_status()
-
-            operation_location = response.headers.get("Operation-Location")
-            if not operation_location:
-                raise ValueError("No Operation-Location header in response")
-
-            # Poll for results
-            for _ in range(60):
-                await asyncio.sleep(2)
-                result_response = await client.get(
-                    operation_location,
-                    headers={"Authorization": f"Bearer {token}"},
-                )
-                result_response.raise_for_status()
-                result = result_response.json()
-
-                status = result.get("status", "")
-                if status == "Succeeded":
-                    return result
-                elif status in ("Failed", "Canceled"):
-                    raise ValueError(f"Analysis failed with status: {status}")
+        body = {"inputs": inputs}
 
-            raise TimeoutError("Document analysis timed out")
+        response = await self._get_http().post(
+            analyze_url,
+            headers=headers,
+            params=params,
+            content=orjson.dumps(body),
+        )
+        response.raise_for_status()
+
+        operation_location = response.headers.get("Operation-Location")
+        if not operation_location:
+            raise ValueError("No Operation-Location header in response")
+        return operation_location
+
+    async def _poll_once(self, operation_location: str) -> tuple[str, bytes, httpx.Response]:
+        """Fetch the current status of an analysis operation."""
+        token = await self._get_token()
+        result_response = await self._get_http().get(
+            operation_location,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        result_response.raise_for_status()
+
+        # Only the status is read here; callers decode the full body once the
+        # operation has succeeded
+        payload = result_response.content
+        match = _STATUS_RE.search(payload)
+        status = match.group(1).decode() if match else orjson.loads(payload).get("status", "")
+        return status, payload, result_response
+
+    async def _run_analysis(self, inputs: list[dict[str, str]]) -> dict[str, Any]:
+        """Submit an analysis request and poll until it completes."""
+        operation_location = await self._submit_analysis(inputs)
+
+        # Poll for results, backing off from 250 ms up to 2 s. A Retry-After
+        # header overrides only the next sleep, and no sleep runs past the
+        # deadline
+        backoff = _POLL_INITIAL_DELAY
+        sleep_for = backoff
+        deadline = time.monotonic() + _POLL_TIMEOUT
+        while True:
+            await asyncio.sleep(sleep_for)
+            status, payload, result_response = await self._poll_once(operation_location)
+            if status == "Succeeded":
+                return orjson.loads(payload)
+            elif status in ("Failed", "Canceled"):
+                raise ValueError(f"Analysis failed with status: {status}")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Document analysis timed out")
+
+            backoff = min(_POLL_MAX_DELAY, backoff * 1.5)
+            retry_after = _retry_after_seconds(result_response)
+            if retry_after is not None:
+                sleep_for = min(max(retry_after, _POLL_INITIAL_DELAY), remaining)
+            else:
+                sleep_for = min(backoff, remaining)
 
 
 # ============================================================================
 # Field Extraction Logic
 # ============================================================================
 
-def extract_loan_fields(analysis_result: dict[str, Any]) -> LoanApplicationData:
+# LoanFields attribute and its key labels (lowercased), in priority order
+_FIELD_ALIASES: list[tuple[str, list[str]]] = [
+    ("applicant_name", ["applicant name", "borrower name", "name", "full name"]),
+    ("ssn_last_4", ["ssn", "social security", "ssn (last 4)"]),
+    ("annual_income", ["annual income", "yearly income", "income", "gross income"]),
+    ("employment_status", ["employment status", "employment"]),
+    ("employer_name", ["employer", "employer name", "current employer"]),
+    ("loan_amount_requested", ["loan amount", "amount requested", "loan amount requested"]),
+    ("loan_purpose", ["loan purpose", "purpose"]),
+    ("property_address", ["property address", "address", "property"]),
+]
+
+# Key label -> (LoanFields attribute, priority); lower priority wins
+_ALIAS_MAP: dict[str, tuple[str, int]] = {
+    alias: (field_name, priority)
+    for field_name, aliases in _FIELD_ALIASES
+    for priority, alias in enumerate(aliases)
+}
+
+_ALIAS_SET = frozenset(_ALIAS_MAP)
+_NUMERIC_FIELDS = frozenset({"annual_income", "loan_amount_requested"})
+
+# Value cleanup runs in a single C-level pass
+_NUM_STRIP = str.maketrans("", "", ",$")
+_NON_DIGIT_RE = re.compile(r"\D+")
+
+
+def extract_loan_fields(analysis_result: dict[str, Any]) -> LoanFields:
     """Extract loan application fields from Content Understanding result."""
     contents = analysis_result.get("result", {}).get("contents", [])
 
     if not contents:
-        return LoanApplicationData()
+        return LoanFields()
 
-    content = contents[0]
+    return extract_content_fields(contents[0])
+
+
+def extract_content_fields(content: dict[str, Any]) -> LoanFields:
+    """Extract loan application fields from a single analyzed content item."""
     markdown = content.get("markdown", "")
     fields = content.get("fields", {})
     kv_pairs = content.get("keyValuePairs", [])
 
-    kv_lookup: dict[str, str] = {}
+    # Single pass over the key-value pairs, keeping the highest-priority
+    # alias seen for each field (later duplicates of the same key win)
+    best: dict[str, tuple[int, str]] = {}
     for kv in kv_pairs:
-        key = kv.get("key", {}).get("content", "").lower().strip()
-        value = kv.get("value", {}).get("content", "")
-        if key and value:
-            kv_lookup[key] = value
-
-    extracted = LoanApplicationData(raw_markdown=markdown[:2000] if markdown else None)
-
-    # Extract fields
-    for key in ["applicant name", "borrower name", "name", "full name"]:
-        if key in kv_lookup:
-            extracted.applicant_name = kv_lookup[key]
-            break
-
-    for key in ["ssn", "social security", "ssn (last 4)"]:
-        if key in kv_lookup:
-            digits = "".join(filter(str.isdigit, kv_lookup[key]))
-            if len(digits) >= 4:
-                extracted.ssn_last_4 = digits[-4:]
-            break
-
-    for key in ["annual income", "yearly income", "income", "gross income"]:
-        if key in kv_lookup:
-            try:
-                extracted.annual_income = float(kv_lookup[key].replace(",", "").replace("$", ""))
-            except ValueError:
-                pass
-            break
-
-    for key in ["employment status", "employment"]:
-        if key in kv_lookup:
-            extracted.employment_status = kv_lookup[key]
-            break
-
-    for key in ["employer", "employer name", "current employer"]:
-        if key in kv_lookup:
-            extracted.employer_name = kv_lookup[key]
-            break
-
-    for key in ["loan amount", "amount requested", "loan amount requested"]:
-        if key in kv_lookup:
+        key_obj = kv.get("key")
+        value_obj = kv.get("value")
+        if not key_obj or not value_obj:
+            continue
+        key = key_obj.get("content") or ""
+        # Labels that are already lowercase skip the extra string allocation
+        if not key.islower():
+            key = key.lower()
+        key = key.strip()
+        if key not in _ALIAS_SET:
+            continue
+        value = value_obj.get("content")
+        if not value:
+            continue
+
+        field_name, priority = _ALIAS_MAP[key]
+        current = best.get(field_name)
+        if current is None or priority <= current[0]:
+            best[field_name] = (priority, value)
+
+    values: dict[str, Any] = {}
+    for field_name, (_, value) in best.items():
+        if field_name in _NUMERIC_FIELDS:
             try:
-                extracted.loan_amount_requested = float(kv_lookup[key].replace(",", "").replace("$", ""))
+                values[field_name] = float(value.translate(_NUM_STRIP))
             except ValueError:
                 pass
-            break
-
-    for key in ["loan purpose", "purpose"]:
-        if key in kv_lookup:
-            extracted.loan_purpose = kv_lookup[key]
-            break
+        elif field_name == "ssn_last_4":
+            digits = _NON_DIGIT_RE.sub("", value)
+            if len(digits) >= 4:
+                values["ssn_last_4"] = digits[-4:]
+        else:
+            values[field_name] = value
 
-    for key in ["property address", "address", "property"]:
-        if key in kv_lookup:
-            extracted.property_address = kv_lookup[key]
-            break
+    if markdown:
+        values["raw_markdown"] = markdown[:2000]
 
-    confidences = [f["confidence"] for f in fields.values() if isinstance(f, dict) and "confidence" in f]
-    if confidences:
-        extracted.confidence_score = sum(confidences) / len(confidences)
+    total = 0.0
+    count = 0
+    for field_data in fields.values():
+        if isinstance(field_data, dict):
+            confidence = field_data.get("confidence")
+            if confidence is not None:
+                total += confidence
+                count += 1
+    if count:
+        values["confidence_score"] = total / count
 
-    return extracted
+    return LoanFields(**values)
 
 
 # ============================================================================
@@ -190,76 +403,157 @@ def extract_loan_fields(analysis_result: dict[str, Any]) -> LoanApplicationData:
 # ============================================================================
 
 _cu_client: ContentUnderstandingClient | None = None
+_cu_lock = asyncio.Lock()
 
 
-def get_cu_client() -> ContentUnderstandingClient:
-    """Get or create Content Understanding client."""
+async def get_cu_client() -> ContentUnderstandingClient:
+    """Get or create Content Understanding client.
+
+    The client and its credential live for the lifetime of the worker so
+    warm invocations reuse the credential's in-memory token cache.
+    """
     global _cu_client
-    if _cu_client is None:
-        endpoint = os.getenv("AZURE_AI_SERVICES_ENDPOINT")
-        if not endpoint:
-            raise ValueError("AZURE_AI_SERVICES_ENDPOINT is required")
-        _cu_client = ContentUnderstandingClient(
-            endpoint=endpoint,
-            credential=DefaultAzureCredential()
-        )
+    if _cu_client is not None:
+        return _cu_client
+    async with _cu_lock:
+        if _cu_client is None:
+            endpoint = os.getenv("AZURE_AI_SERVICES_ENDPOINT")
+            if not endpoint:
+                raise ValueError("AZURE_AI_SERVICES_ENDPOINT is required")
+            _cu_client = ContentUnderstandingClient(
+                endpoint=endpoint,
+                credential=DefaultAzureCredential()
+            )
     return _cu_client
 
 
+@atexit.register
+def _close_cu_client() -> None:
+    """Release pooled connections when the worker process exits."""
+    if _cu_client is not None:
+        try:
+            asyncio.run(_cu_client.aclose())
+        except Exception:
+            logger.debug("Failed to close Content Understanding client", exc_info=True)
+
+
 # ============================================================================
 # HTTP Endpoints
 # ============================================================================
 
+# Tool results are compact on the wire; set MCP_PRETTY_JSON=1 to indent them
+_TEXT_JSON_OPTION = orjson.OPT_INDENT_2 if os.getenv("MCP_PRETTY_JSON", "").lower() in ("1", "true") else 0
+
+_HEALTH_BODY = orjson.dumps({
+    "status": "healthy",
+    "service": "content-understanding-mcp",
+    "version": "1.0.0"
+})
+
+_TOOLS = [
+    {
+        "name": "extract_loan_data",
+        "description": "Extract structured loan application data from a document",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "document_url": {
+                    "type": "string",
+                    "description": "URL of the loan document to analyze",
+                },
+            },
+            "required": ["document_url"],
+        },
+    },
+    {
+        "name": "extract_loan_data_batch",
+        "description": (
+            "Extract structured loan application data from several documents in one analysis; "
+            "returns one {document_url, loan_data} entry per URL, in input order"
+        ),
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "document_urls": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "URLs of the loan documents to analyze",
+                },
+            },
+            "required": ["document_urls"],
+        },
+    },
+    {
+        "name": "start_extract_loan_data",
+        "description": "Start loan data extraction for a document and return a job_id without waiting",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "document_url": {
+                    "type": "string",
+                    "description": "URL of the loan document to analyze",
+                },
+            },
+            "required": ["document_url"],
+        },
+    },
+    {
+        "name": "get_extract_loan_data_result",
+        "description": "Check a job started by start_extract_loan_data; returns the loan data once analysis is done",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "job_id": {
+                    "type": "string",
+                    "description": "job_id returned by start_extract_loan_data",
+                },
+            },
+            "required": ["job_id"],
+        },
+    },
+    {
+        "name": "extract_loan_data_with_text",
+        "description": "Extract structured loan application data and the full markdown text from a document in one analysis",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "document_url": {
+                    "type": "string",
+                    "description": "URL of the loan document to analyze",
+                },
+            },
+            "required": ["document_url"],
+        },
+    },
+    {
+        "name": "get_document_text",
+        "description": "Extract full text/markdown content from a document",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "document_url": {
+                    "type": "string",
+                    "description": "URL of the document",
+                },
+            },
+            "required": ["document_url"],
+        },
+    },
+]
+
+_TOOLS_BODY = orjson.dumps({"tools": _TOOLS})
+
+
 @app.route(route="health", methods=["GET"])
 async def health_check(req: func.HttpRequest) -> func.HttpResponse:
     """Health check endpoint."""
-    return func.HttpResponse(
-        json.dumps({
-            "status": "healthy",
-            "service": "content-understanding-mcp",
-            "version": "1.0.0"
-        }),
-        mimetype="application/json"
-    )
+    return func.HttpResponse(_HEALTH_BODY, mimetype="application/json")
 
 
 @app.route(route="mcp/tools", methods=["GET"])
 async def list_tools(req: func.HttpRequest) -> func.HttpResponse:
     """List available MCP tools."""
-    tools = [
-        {
-            "name": "extract_loan_data",
-            "description": "Extract structured loan application data from a document",
-            "inputSchema": {
-                "type": "object",
-                "properties": {
-                    "document_url": {
-                        "type": "string",
-                        "description": "URL of the loan document to analyze",
-                    },
-                },
-                "required": ["document_url"],
-            },
-        },
-        {
-            "name": "get_document_text",
-            "description": "Extract full text/markdown content from a document",
-            "inputSchema": {
-                "type": "object",
-                "properties": {
-                    "document_url": {
-                        "type": "string",
-                        "description": "URL of the document",
-                    },
-                },
-                "required": ["document_url"],
-            },
-        },
-    ]
-    return func.HttpResponse(
-        json.dumps({"tools": tools}),
-        mimetype="application/json"
-    )
+    return func.HttpResponse(_TOOLS_BODY, mimetype="application/json")
 
 
 @app.route(route="mcp/tools/call", methods=["POST"])
@@ -274,48 +568,162 @@ async def call_tool(req: func.HttpRequest) -> func.HttpResponse:
             document_url = arguments.get("document_url")
             if not document_url:
                 return func.HttpResponse(
-                    json.dumps({"error": "document_url is required"}),
+                    orjson.dumps({"error": "document_url is required"}),
                     status_code=400,
                     mimetype="application/json"
                 )
 
-            client = get_cu_client()
+            client = await get_cu_client()
             result = await client.analyze_document(document_url)
             loan_data = extract_loan_fields(result)
 
             return func.HttpResponse(
-                json.dumps({
+                orjson.dumps({
+                    "content": [
+                        {"type": "text", "text": orjson.dumps(loan_data.as_dict(), option=_TEXT_JSON_OPTION).decode()}
+                    ]
+                }),
+                mimetype="application/json"
+            )
+
+        elif tool_name == "extract_loan_data_batch":
+            document_urls = arguments.get("document_urls")
+            if (
+                not isinstance(document_urls, list)
+                or not document_urls
+                or not all(isinstance(url, str) and url for url in document_urls)
+            ):
+                return func.HttpResponse(
+                    orjson.dumps({"error": "document_urls must be a non-empty list of URLs"}),
+                    status_code=400,
+                    mimetype="application/json"
+                )
+
+            client = await get_cu_client()
+            contents = await client.analyze_documents(document_urls)
+            loan_data = [
+                {"document_url": url, "loan_data": extract_content_fields(content).as_dict()}
+                for url, content in zip(document_urls, contents)
+            ]
+
+            return func.HttpResponse(
+                orjson.dumps({
                     "content": [
-                        {"type": "text", "text": json.dumps(loan_data.model_dump(exclude_none=True), indent=2)}
+                        {"type": "text", "text": orjson.dumps(loan_data, option=_TEXT_JSON_OPTION).decode()}
                     ]
                 }),
                 mimetype="application/json"
             )
 
+        elif tool_name == "start_extract_loan_data":
+            document_url = arguments.get("document_url")
+            if not document_url:
+                return func.HttpResponse(
+                    orjson.dumps({"error": "document_url is required"}),
+                    status_code=400,
+                    mimetype="application/json"
+                )
+
+            client = await get_cu_client()
+            operation_location = await client.start_analysis(document_url)
+            job_id = base64.urlsafe_b64encode(operation_location.encode()).decode()
+
+            return func.HttpResponse(
+                orjson.dumps({
+                    "content": [
+                        {"type": "text", "text": orjson.dumps({"job_id": job_id, "status": "Running"}).decode()}
+                    ]
+                }),
+                mimetype="application/json"
+            )
+
+        elif tool_name == "get_extract_loan_data_result":
+            job_id = arguments.get("job_id")
+            if not job_id:
+                return func.HttpResponse(
+                    orjson.dumps({"error": "job_id is required"}),
+                    status_code=400,
+                    mimetype="application/json"
+                )
+
+            client = await get_cu_client()
+            operation_location = None
+            if isinstance(job_id, str):
+                try:
+                    operation_location = base64.urlsafe_b64decode(job_id.encode()).decode()
+                except (binascii.Error, UnicodeDecodeError):
+                    pass
+            if operation_location is None or not client.owns_operation(operation_location):
+                return func.HttpResponse(
+                    orjson.dumps({"error": "Invalid job_id"}),
+                    status_code=400,
+                    mimetype="application/json"
+                )
+
+            result = await client.get_analysis_result(operation_location)
+            if result is None:
+                text = orjson.dumps({"job_id": job_id, "status": "Running"}).decode()
+            else:
+                loan_data = extract_loan_fields(result)
+                text = orjson.dumps(loan_data.as_dict(), option=_TEXT_JSON_OPTION).decode()
+
+            return func.HttpResponse(
+                orjson.dumps({
+                    "content": [{"type": "text", "text": text}]
+                }),
+                mimetype="application/json"
+            )
+
         elif tool_name == "get_document_text":
             document_url = arguments.get("document_url")
             if not document_url:
                 return func.HttpResponse(
-                    json.dumps({"error": "document_url is required"}),
+                    orjson.dumps({"error": "document_url is required"}),
                     status_code=400,
                     mimetype="application/json"
                 )
 
-            client = get_cu_client()
+            client = await get_cu_client()
             result = await client.analyze_document(document_url)
             contents = result.get("result", {}).get("contents", [])
             markdown = contents[0].get("markdown", "") if contents else ""
 
             return func.HttpResponse(
-                json.dumps({
+                orjson.dumps({
                     "content": [{"type": "text", "text": markdown}]
                 }),
                 mimetype="application/json"
             )
 
+        elif tool_name == "extract_loan_data_with_text":
+            document_url = arguments.get("document_url")
+            if not document_url:
+                return func.HttpResponse(
+                    orjson.dumps({"error": "document_url is required"}),
+                    status_code=400,
+                    mimetype="application/json"
+                )
+
+            # One analysis serves both the structured fields and the full text
+            client = await get_cu_client()
+            result = await client.analyze_document(document_url)
+            loan_data = extract_loan_fields(result)
+            contents = result.get("result", {}).get("contents", [])
+            markdown = contents[0].get("markdown", "") if contents else ""
+
+            return func.HttpResponse(
+                orjson.dumps({
+                    "content": [
+                        {"type": "text", "text": orjson.dumps(loan_data.as_dict(), option=_TEXT_JSON_OPTION).decode()},
+                        {"type": "text", "text": markdown},
+                    ]
+                }),
+                mimetype="application/json"
+            )
+
         else:
             return func.HttpResponse(
-                json.dumps({"error": f"Unknown tool: {tool_name}"}),
+                orjson.dumps({"error": f"Unknown tool: {tool_name}"}),
                 status_code=400,
                 mimetype="application/json"
             )
@@ -323,7 +731,7 @@ async def call_tool(req: func.HttpRequest) -> func.HttpResponse:
     except Exception as e:
         logger.exception("Error calling tool")
         return func.HttpResponse(
-            json.dumps({"error": str(e)}),
+            orjson.dumps({"error": str(e)}),
             status_code=500,
             mimetype="application/json"
         )
@@ -6,9 +6,9 @@ Key-based auth is handled by Azure Functions (AuthLevel.FUNCTION).
 """
 
 import azure.functions as func
-from mcp_server import mcp
+from mcp_server import streamable_http_app
 
 app = func.AsgiFunctionApp(
-    app=mcp.streamable_http_app(),
+    app=streamable_http_app(),
     http_auth_level=func.AuthLevel.FUNCTION,
 )
@@ -9,11 +9,14 @@ import json
 import logging
 import os
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from pathlib import Path
 
+from aiohttp import ClientSession, DummyCookieJar, TCPConnector
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
+from azure.core.pipeline.transport import AioHttpTransport
 from azure.cosmos.aio import CosmosClient
 from azure.identity.aio import DefaultAzureCredential
 
@@ -30,6 +33,8 @@ COSMOS_ENDPOINT = os.environ.get("COSMOS_ENDPOINT", "")
 COSMOS_KEY = os.environ.get("COSMOS_KEY", "")
 COSMOS_DATABASE = os.environ.get("COSMOS_DATABASE", "frontier-db")
 COSMOS_CONTAINER = os.environ.get("COSMOS_CONTAINER", "orders")
+# Tool results are compact on the wire; set MCP_PRETTY_JSON=1 to indent them
+JSON_INDENT = 2 if os.environ.get("MCP_PRETTY_JSON", "").lower() in ("1", "true") else None
 
 # --- MCP Server ---
 mcp = FastMCP(
@@ -38,25 +43,79 @@ mcp = FastMCP(
         "You help users manage customer orders stored in Azure Cosmos DB. "
         "Use the available tools to query, create, update, and cancel orders."
     ),
+    # Tools are independent request/response calls, so no per-session
+    # transport is kept; idle sessions cannot pile up across scale-out
+    stateless_http=True,
 )
 
 # --- Lazy Cosmos DB connection ---
+_session: ClientSession | None = None
 _credential = None
 _client: CosmosClient | None = None
 _container = None
 
 
+def _shared_transport() -> AioHttpTransport:
+    """Get an Azure transport backed by the shared aiohttp session.
+
+    Cosmos DB and the token credential reuse one tuned connection pool
+    instead of each opening their own. Like azure-core's own session, it
+    honours proxy environment variables and keeps no cookies.
+    """
+    global _session
+    if _session is None:
+        _session = ClientSession(
+            connector=TCPConnector(limit=100, limit_per_host=32, keepalive_timeout=120),
+            trust_env=True,
+            cookie_jar=DummyCookieJar(),
+        )
+    return AioHttpTransport(session=_session, session_owner=False)
+
+
+async def close_connections() -> None:
+    """Close the Cosmos DB client, credential and shared aiohttp session."""
+    global _session, _credential, _client, _container
+    if _client is not None:
+        await _client.close()
+    if _credential is not None:
+        await _credential.close()
+    if _session is not None:
+        await _session.close()
+    _session = _credential = _client = _container = None
+
+
+def streamable_http_app():
+    """Build the streamable-http ASGI app, closing shared connections on shutdown."""
+    app = mcp.streamable_http_app()
+    session_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with session_lifespan(app) as state:
+            try:
+                yield state
+            finally:
+                await close_connections()
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
 async def get_container():
     """Get (or create) the Cosmos DB container client."""
     global _credential, _client, _container
     if _container is None:
         if COSMOS_KEY:
             logger.info("Connecting to Cosmos DB with account key")
-            _client = CosmosClient(COSMOS_ENDPOINT, credential=COSMOS_KEY)
+            _client = CosmosClient(
+                COSMOS_ENDPOINT, credential=COSMOS_KEY, transport=_shared_transport()
+            )
         else:
             logger.info("Connecting to Cosmos DB with DefaultAzureCredential")
-            _credential = DefaultAzureCredential()
-            _client = CosmosClient(COSMOS_ENDPOINT, credential=_credential)
+            _credential = DefaultAzureCredential(transport=_shared_transport())
+            _client = CosmosClient(
+                COSMOS_ENDPOINT, credential=_credential, transport=_shared_transport()
+            )
 
         db = _client.get_database_client(COSMOS_DATABASE)
         _container = db.get_container_client(COSMOS_CONTAINER)
@@ -86,7 +145,7 @@ async def get_order(order_id: str, customer_id: str) -> str:
     container = await get_container()
     try:
         item = await container.read_item(item=order_id, partition_key=customer_id)
-        return json.dumps(_strip_cosmos_metadata(item), indent=2, default=str)
+        return json.dumps(_strip_cosmos_metadata(item), indent=JSON_INDENT, default=str)
     except Exception as e:
         return json.dumps({"error": str(e)})
 
@@ -106,7 +165,7 @@ async def query_orders_by_customer(customer_name: str) -> str:
     async for item in container.query_items(query=query, parameters=parameters):
         results.append(_strip_cosmos_metadata(item))
 
-    return json.dumps({"count": len(results), "orders": results}, indent=2, default=str)
+    return json.dumps({"count": len(results), "orders": results}, indent=JSON_INDENT, default=str)
 
 
 @mcp.tool()
@@ -124,7 +183,7 @@ async def query_orders_by_status(status: str) -> str:
     async for item in container.query_items(query=query, parameters=parameters):
         results.append(_strip_cosmos_metadata(item))
 
-    return json.dumps({"count": len(results), "orders": results}, indent=2, default=str)
+    return json.dumps({"count": len(results), "orders": results}, indent=JSON_INDENT, default=str)
 
 
 @mcp.tool()
@@ -146,7 +205,7 @@ async def list_customers() -> str:
         customers[cid]["orderCount"] += 1
 
     result = sorted(customers.values(), key=lambda x: x["customerName"])
-    return json.dumps({"count": len(result), "customers": result}, indent=2)
+    return json.dumps({"count": len(result), "customers": result}, indent=JSON_INDENT)
 
 
 # ============================================================================
@@ -188,7 +247,7 @@ async def create_order(
     created = await container.create_item(body=order)
     return json.dumps(
         {"message": "Order created", "order": _strip_cosmos_metadata(created)},
-        indent=2,
+        indent=JSON_INDENT,
         default=str,
     )
 
@@ -223,7 +282,7 @@ async def update_order_status(order_id: str, customer_id: str, new_status: str)
                 "message": f"Status changed from {old_status} to {new_status}",
                 "order": _strip_cosmos_metadata(updated),
             },
-            indent=2,
+            indent=JSON_INDENT,
             default=str,
         )
     except Exception as e:
@@ -255,7 +314,7 @@ async def cancel_order(order_id: str, customer_id: str, reason: str) -> str:
         updated = await container.replace_item(item=order_id, body=item)
         return json.dumps(
             {"message": f"Order {order_id} cancelled", "order": _strip_cosmos_metadata(updated)},
-            indent=2,
+            indent=JSON_INDENT,
             default=str,
         )
     except Exception as e:
@@ -272,4 +331,12 @@ if __name__ == "__main__":
     print(f"  Database:  {COSMOS_DATABASE}")
     print(f"  Container: {COSMOS_CONTAINER}")
     print(f"  Endpoint:  http://127.0.0.1:8000/mcp")
-    mcp.run(transport="streamable-http")
+
+    import uvicorn
+
+    uvicorn.run(
+        streamable_http_app(),
+        host=mcp.settings.host,
+        port=mcp.settings.port,
+        log_level=mcp.settings.log_level.lower(),
+    )
@@ -4,16 +4,20 @@ Health check for Loan Processor PoC.
 Validates that all dependencies are installed and Azure connectivity works.
 """
 
+import importlib.util
+import io
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TextIO
 
 
-def print_status(message: str, success: bool) -> bool:
+def print_status(message: str, success: bool, file: TextIO | None = None) -> bool:
     """Print status with indicator."""
     status = "✓" if success else "✗"
     color = "\033[92m" if success else "\033[91m"
     reset = "\033[0m"
-    print(f"  {color}{status}{reset} {message}")
+    print(f"  {color}{status}{reset} {message}", file=file)
     return success
 
 
@@ -32,9 +36,11 @@ def check_core_packages() -> bool:
         ("starlette", "Starlette"),
     ]
 
+    # find_spec only locates the package; it does not execute the module
     for module, name in packages:
         try:
-            __import__(module)
+            if importlib.util.find_spec(module) is None:
+                raise ImportError(f"No module named '{module}'")
             print_status(name, True)
         except ImportError as e:
             print_status(f"{name}: {e}", False)
@@ -120,9 +126,13 @@ def check_config() -> bool:
         return False
 
 
-def check_azure_connectivity() -> bool:
-    """Check Azure connectivity (optional - requires .env)."""
-    print("\n☁️  Azure Connectivity:")
+def check_azure_connectivity(file: TextIO | None = None) -> bool:
+    """Check Azure connectivity (optional - requires .env).
+
+    Args:
+        file: Stream to write results to (defaults to stdout).
+    """
+    print("\n☁️  Azure Connectivity:", file=file)
 
     try:
         from dotenv import load_dotenv
@@ -132,7 +142,7 @@ def check_azure_connectivity() -> bool:
 
         storage_account = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
         if not storage_account:
-            print_status("AZURE_STORAGE_ACCOUNT_NAME not set (skipping)", True)
+            print_status("AZURE_STORAGE_ACCOUNT_NAME not set (skipping)", True, file)
             return True
 
         from azure.identity import DefaultAzureCredential
@@ -144,12 +154,12 @@ def check_azure_connectivity() -> bool:
 
         # Try to list containers (validates connectivity)
         containers = list(client.list_containers(max_results=1))
-        print_status(f"Connected to {storage_account}", True)
+        print_status(f"Connected to {storage_account}", True, file)
         return True
 
     except Exception as e:
-        print_status(f"Azure connection failed: {e}", False)
-        print("    (This is OK if you haven't deployed Azure resources yet)")
+        print_status(f"Azure connection failed: {e}", False, file)
+        print("    (This is OK if you haven't deployed Azure resources yet)", file=file)
         return True  # Don't fail health check for this
 
 
@@ -159,14 +169,20 @@ def main() -> int:
     print("🏦 Loan Processor PoC - Health Check")
     print("=" * 50)
 
-    results = [
-        check_core_packages(),
-        check_agent_framework(),
-        check_mcp(),
-        check_mcp_server_module(),
-        check_config(),
-        check_azure_connectivity(),
-    ]
+    # The Azure round-trip is the slowest check, so run it in the background
+    # while the local checks execute, and print its buffered output last
+    azure_output = io.StringIO()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        azure_check = executor.submit(check_azure_connectivity, azure_output)
+        results = [
+            check_core_packages(),
+            check_agent_framework(),
+            check_mcp(),
+            check_mcp_server_module(),
+            check_config(),
+        ]
+        results.append(azure_check.result())
+    print(azure_output.getvalue(), end="")
 
     print("\n" + "=" * 50)
     if all(results):
@@ -9,24 +9,33 @@ import contextlib
 import logging
 import os
 
+import orjson
 from dotenv import load_dotenv
 from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
 from starlette.applications import Starlette
 from starlette.middleware.cors import CORSMiddleware
 from starlette.routing import Mount, Route
-from starlette.responses import JSONResponse
+from starlette.responses import Response
 from starlette.types import Receive, Scope, Send
 import uvicorn
 
-from .mcp_server import create_mcp_server
+from .mcp_server import get_cu_client, create_mcp_server
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class ORJSONResponse(Response):
+    """JSON response rendered with orjson."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
 async def health_check(request):
     """Health check endpoint."""
-    return JSONResponse({
+    return ORJSONResponse({
         "status": "healthy",
         "service": "content-understanding-mcp",
         "transport": "streamable-http",
@@ -38,7 +47,8 @@ def create_app() -> Starlette:
     load_dotenv()
 
     # Create MCP server
-    mcp_server = create_mcp_server()
+    cu_client = get_cu_client()
+    mcp_server = create_mcp_server(cu_client)
 
     # Create the session manager with stateless mode for scalability
     session_manager = StreamableHTTPSessionManager(
@@ -61,10 +71,12 @@ def create_app() -> Starlette:
                 yield
             finally:
                 logger.info("Shutting down MCP Server...")
+                await cu_client.aclose()
 
     # Create the Starlette app
+    # Debug tracebacks are opt-in; they add formatting work to every error
     starlette_app = Starlette(
-        debug=True,
+        debug=os.getenv("MCP_DEBUG", "").lower() in ("1", "true"),
         routes=[
             Route("/health", health_check, methods=["GET"]),
             Mount("/mcp", app=handle_streamable_http),
@@ -85,6 +97,8 @@ def create_app() -> Starlette:
 
 def main():
     """Run the local MCP server."""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
     host = os.getenv("MCP_HOST", "0.0.0.0")
     port = int(os.getenv("MCP_PORT", "8000"))
 
@@ -93,7 +107,14 @@ def main():
     logger.info(f"Health check: http://{host}:{port}/health")
 
     app = create_app()
-    uvicorn.run(app, host=host, port=port)
+    # uvicorn[standard] provides uvloop and httptools, which uvicorn picks
+    # automatically where supported; per-request access logs are opt-in
+    uvicorn.run(
+        app,
+        host=host,
+        port=port,
+        access_log=os.getenv("MCP_ACCESS_LOG", "").lower() in ("1", "true"),
+    )
 
 
 if __name__ == "__main__":
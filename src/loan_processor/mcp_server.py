@@ -6,23 +6,39 @@ as MCP tools for loan document processing. Can be run locally for testing
 or deployed to Azure Container Apps.
 """
 
+from __future__ import annotations
+
 import asyncio
-import json
+import functools
+import hashlib
 import logging
+import math
 import os
-from dataclasses import dataclass
-from typing import Any
-
-import httpx
-from azure.identity import DefaultAzureCredential
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, ClassVar, Coroutine
+from urllib.parse import urlsplit, urlunsplit
+
+import orjson
 from mcp.server import Server
-from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 from pydantic import BaseModel, Field
 
-logging.basicConfig(level=logging.INFO)
+# httpx and azure-identity are imported where they are used, so importing
+# this module for the schema alone (e.g. from health_check) stays cheap
+if TYPE_CHECKING:
+    import httpx
+    from azure.core.credentials import AccessToken, TokenCredential
+
 logger = logging.getLogger(__name__)
 
+# Tool results are compact on the wire; set MCP_PRETTY_JSON=1 to indent them
+_PRETTY_JSON = os.getenv("MCP_PRETTY_JSON", "").lower() in ("1", "true")
+_JSON_OPTION = orjson.OPT_INDENT_2 if _PRETTY_JSON else 0
+
 
 # ============================================================================
 # Loan Application Schema
@@ -47,31 +63,118 @@ class LoanApplicationData(BaseModel):
 # Content Understanding Client
 # ============================================================================
 
+def _retry_after_seconds(response: httpx.Response) -> float | None:
+    """Parse a Retry-After header in seconds, ignoring negative or non-finite values."""
+    retry_after = response.headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        seconds = float(retry_after)
+    except ValueError:
+        return None
+    return seconds if math.isfinite(seconds) and seconds >= 0 else None
+
+
 @dataclass
 class ContentUnderstandingClient:
-    """Client for Azure Content Understanding API."""
+    """
+    Client for Azure Content Understanding API.
+
+    Pass ``http_client`` to share a caller-owned connection pool; otherwise
+    the client builds its own on first use and closes it in ``aclose``.
+    """
 
     endpoint: str
-    credential: DefaultAzureCredential
+    credential: TokenCredential
     api_version: str = "2025-11-01"
+    cache_ttl: float = 900.0
+    cache_size: int = 512
+    failure_ttl: float = 10.0
+    client_error_ttl: float = 300.0
+    # HTTP 4xx statuses that are not cached for client_error_ttl
+    _TRANSIENT_CLIENT_ERRORS: ClassVar[frozenset[int]] = frozenset({401, 403, 408, 429})
+    http_client: httpx.AsyncClient | None = field(default=None, repr=False)
+    max_concurrency: int = 16
+    max_document_bytes: int | None = None
+    _semaphore: asyncio.Semaphore = field(init=False, repr=False)
+    _cached_token: AccessToken | None = field(default=None, init=False, repr=False)
+    _token_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False, repr=False)
+    _http: httpx.AsyncClient | None = field(default=None, init=False, repr=False)
+    # key -> (stored at, analysis result, extracted loan fields by keep_markdown)
+    _cache: OrderedDict[str, tuple[float, dict[str, Any], dict[bool, LoanApplicationData]]] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    _failures: OrderedDict[str, tuple[float, BaseException]] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    _inflight: dict[str, asyncio.Task] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use."""
+        if self.http_client is not None:
+            return self.http_client
+        if self._http is None:
+            import httpx
+
+            # Connections are retried on connect errors only; the analyze
+            # POST itself is never replayed
+            transport = httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=2,
+                limits=httpx.Limits(
+                    max_keepalive_connections=32,
+                    max_connections=64,
+                    keepalive_expiry=30.0,
+                ),
+            )
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                transport=transport,
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        """Close the client's own HTTP pool; an injected http_client is left open."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     async def _get_token(self) -> str:
-        """Get access token for Content Understanding API."""
-        token = self.credential.get_token("https://cognitiveservices.azure.com/.default")
-        return token.token
+        """
+        Get access token for Content Understanding API.
+
+        The token is reused until five minutes before it expires. Refreshes are
+        serialized by a lock and run in a worker thread, since the credential
+        call blocks.
+        """
+        async with self._token_lock:
+            if self._cached_token is None or self._cached_token.expires_on - time.time() <= 300:
+                self._cached_token = await asyncio.to_thread(
+                    self.credential.get_token, "https://cognitiveservices.azure.com/.default"
+                )
+            return self._cached_token.token
 
     async def _poll_for_result(self, client: httpx.AsyncClient, operation_location: str, token: str) -> dict[str, Any]:
-        """Poll for analysis results."""
-        logger.info(f"Polling for results at: {operation_location}")
-        for _ in range(60):  # Max 60 attempts (2 minutes)
-            await asyncio.sleep(2)
+        """
+        Poll for analysis results.
 
+        Polls immediately, then waits 250ms and doubles the delay up to 2s
+        for at most two minutes. A Retry-After header overrides only the next
+        wait, clamped to at least 250ms and at most the time remaining.
+        """
+        logger.info("Polling for results at: %s", operation_location)
+        backoff = 0.25
+        deadline = time.monotonic() + 120
+        while True:
             result_response = await client.get(
                 operation_location,
                 headers={"Authorization": f"Bearer {token}"},
             )
             result_response.raise_for_status()
-            result = result_response.json()
+            result = orjson.loads(result_response.content)
 
             status = result.get("status", "")
             if status == "Succeeded":
@@ -80,20 +183,154 @@ class ContentUnderstandingClient:
             elif status in ("Failed", "Canceled"):
                 raise ValueError(f"Analysis failed with status: {status}")
 
-            logger.debug(f"Analysis status: {status}, waiting...")
+            logger.debug("Analysis status: %s, waiting...", status)
 
-        raise TimeoutError("Document analysis timed out")
+            remaining = deadline - time.monotonic()
+            retry_after = _retry_after_seconds(result_response)
+            delay = backoff if retry_after is None else max(0.25, min(retry_after, remaining))
 
-    async def analyze_document(self, document_url: str) -> dict[str, Any]:
+            if time.monotonic() + delay >= deadline:
+                raise TimeoutError("Document analysis timed out")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, 2.0)
+
+    async def analyze_document(self, document_url: str, cache: bool = True) -> dict[str, Any]:
         """
         Analyze a document using Content Understanding via URL.
 
+        Successful results are cached by the SHA-256 of the canonical URL
+        (see ``_cache_key``) for ``cache_ttl`` seconds, and concurrent
+        requests for the same URL share a single analysis. Failures are
+        remembered briefly and re-raised: ``client_error_ttl`` seconds for
+        HTTP 4xx responses that point at the document, ``failure_ttl`` for
+        the rest, including auth (401/403), timeout (408) and throttling (429).
+
         Args:
             document_url: URL of the document to analyze (public URL, raw GitHub URL, etc.)
+            cache: Set to False to force a fresh analysis.
 
         Returns:
             Analysis result with extracted fields
         """
+        key = self._cache_key(document_url)
+
+        if cache:
+            hit = self._cache.get(key)
+            if hit is not None:
+                if time.monotonic() - hit[0] < self.cache_ttl:
+                    self._cache.move_to_end(key)
+                    logger.info("Using cached analysis for URL: %s", document_url)
+                    return hit[1]
+                del self._cache[key]
+
+            failure = self._failures.get(key)
+            if failure is not None:
+                if time.monotonic() < failure[0]:
+                    logger.info("Using cached failure for URL: %s", document_url)
+                    raise failure[1]
+                del self._failures[key]
+
+            task = self._inflight.get(key)
+            if task is not None:
+                return await asyncio.shield(task)
+
+        task = asyncio.create_task(self._analyze_document(document_url))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._store_result(key, t))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _cache_key(document_url: str) -> str:
+        """Hash the URL with scheme/host lowercased and any fragment dropped."""
+        parts = urlsplit(document_url.strip())
+        canonical = urlunsplit(
+            (parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, "")
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _store_result(self, key: str, task: asyncio.Task) -> None:
+        """Cache a finished analysis, evicting the least recently used entry."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+
+        exc = task.exception()
+        if exc is not None:
+            status = getattr(getattr(exc, "response", None), "status_code", 0)
+            # 401/403 come from credentials or RBAC and 408/429 are transient,
+            # so none of them say anything lasting about this URL
+            client_error = 400 <= status < 500 and status not in self._TRANSIENT_CLIENT_ERRORS
+            ttl = self.client_error_ttl if client_error else self.failure_ttl
+            self._failures[key] = (time.monotonic() + ttl, exc)
+            self._failures.move_to_end(key)
+            if len(self._failures) > self.cache_size:
+                self._failures.popitem(last=False)
+            return
+
+        self._failures.pop(key, None)
+        self._cache[key] = (time.monotonic(), task.result(), {})
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def loan_fields(
+        self, document_url: str, analysis_result: dict[str, Any], keep_markdown: bool = True
+    ) -> LoanApplicationData:
+        """
+        Extract loan fields from an analysis of ``document_url``.
+
+        When ``analysis_result`` is the cached analysis for that URL, the
+        extracted model is memoized in the same cache entry, so it is evicted
+        together with the result. Each call returns its own copy.
+        """
+        entry = self._cache.get(self._cache_key(document_url))
+        if entry is None or entry[1] is not analysis_result:
+            return extract_loan_fields(analysis_result, keep_markdown)
+
+        loan_data = entry[2].get(keep_markdown)
+        if loan_data is None:
+            loan_data = entry[2][keep_markdown] = extract_loan_fields(analysis_result, keep_markdown)
+        return loan_data.model_copy()
+
+    async def _analyze_document(self, document_url: str) -> dict[str, Any]:
+        """
+        Submit a document for analysis and wait for the result.
+
+        At most ``max_concurrency`` analyses run at once so bursts queue here
+        instead of exhausting the connection pool or tripping throttling.
+        Documents whose Content-Length exceeds ``max_document_bytes`` are
+        rejected before any analysis is submitted.
+        """
+        if self.max_document_bytes is not None:
+            size = await self._content_length(document_url)
+            if size is not None and size > self.max_document_bytes:
+                raise ValueError(
+                    f"Document is {size} bytes, larger than the {self.max_document_bytes} byte limit"
+                )
+
+        async with self._semaphore:
+            return await self._submit_and_poll(document_url)
+
+    async def _content_length(self, document_url: str) -> int | None:
+        """
+        Return the document's Content-Length from a HEAD request, or None if unknown.
+
+        Redirects are not followed, so the server only ever probes the URL the
+        caller supplied.
+        """
+        client = await self._client()
+        try:
+            response = await client.head(document_url, follow_redirects=False, timeout=10.0)
+            return int(response.headers["content-length"]) if response.is_success else None
+        except Exception as e:
+            # The size check is best effort; Content Understanding reports
+            # unreachable documents itself
+            logger.debug("HEAD %s failed: %s", document_url, e)
+            return None
+
+    async def _submit_and_poll(self, document_url: str) -> dict[str, Any]:
+        """Submit the analyze request, retrying on 429/503, then poll for the result."""
         token = await self._get_token()
 
         # Remove trailing slash from endpoint if present
@@ -109,159 +346,207 @@ class ContentUnderstandingClient:
         params = {"api-version": self.api_version}
         body = {"inputs": [{"url": document_url}]}
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            logger.info(f"Starting document analysis for URL: {document_url}")
-            logger.debug(f"Analyze URL: {analyze_url}")
+        client = await self._client()
+        logger.info("Starting document analysis for URL: %s", document_url)
+        logger.debug("Analyze URL: %s", analyze_url)
+        delay = 1.0
+        for attempt in range(3):
             response = await client.post(
                 analyze_url,
                 headers=headers,
                 params=params,
                 json=body,
             )
-            
-            # Log error details if request fails
-            if response.status_code >= 400:
-                logger.error(f"API Error: {response.status_code} - {response.text}")
-            
-            response.raise_for_status()
+            if response.status_code not in (429, 503) or attempt == 2:
+                break
 
-            operation_location = response.headers.get("Operation-Location")
-            if not operation_location:
-                raise ValueError("No Operation-Location header in response")
+            retry_after = _retry_after_seconds(response)
+            wait = delay if retry_after is None else retry_after
+            logger.warning("Analyze request throttled (%s), retrying in %ss", response.status_code, wait)
+            await asyncio.sleep(wait)
+            delay *= 2
 
-            return await self._poll_for_result(client, operation_location, token)
+        # Log error details if request fails
+        if response.status_code >= 400:
+            logger.error("API Error: %s - %s", response.status_code, response.text)
+        
+        response.raise_for_status()
+
+        operation_location = response.headers.get("Operation-Location")
+        if not operation_location:
+            raise ValueError("No Operation-Location header in response")
+
+        return await self._poll_for_result(client, operation_location, token)
 
 
 # ============================================================================
 # Field Extraction Logic
 # ============================================================================
 
-def extract_loan_fields(analysis_result: dict[str, Any]) -> LoanApplicationData:
+_NON_DIGIT_RE = re.compile(r"\D+")
+_MONEY_STRIP = str.maketrans("", "", ",$ ")
+
+
+def _parse_money(value: str) -> float | None:
+    """Parse a currency amount such as "$120,000"."""
+    try:
+        return float(value.translate(_MONEY_STRIP))
+    except ValueError:
+        return None
+
+
+def _parse_ssn_last4(value: str) -> str | None:
+    """Return the last 4 digits of an SSN, if it has at least 4."""
+    digits = _NON_DIGIT_RE.sub("", value)
+    return digits[-4:] if len(digits) >= 4 else None
+
+
+def _norm(key: str) -> str:
+    """Normalize a key for alias lookup (folds NBSP, full-width and case variants)."""
+    return unicodedata.normalize("NFKC", key).strip().casefold()
+
+
+# Target field, value parser and key aliases, with aliases in priority order
+_FIELD_SPECS: list[tuple[str, Callable[[str], Any], list[str]]] = [
+    ("applicant_name", str, ["applicant name", "borrower name", "name", "full name", "applicant"]),
+    ("ssn_last_4", _parse_ssn_last4, ["ssn", "social security", "social security number", "ssn (last 4)"]),
+    ("annual_income", _parse_money, ["annual income", "yearly income", "income", "gross income", "annual salary"]),
+    ("employment_status", str, ["employment status", "employment", "work status"]),
+    ("employer_name", str, ["employer", "employer name", "company", "current employer"]),
+    ("loan_amount_requested", _parse_money, ["loan amount", "amount requested", "requested amount", "loan amount requested"]),
+    ("loan_purpose", str, ["loan purpose", "purpose", "purpose of loan", "loan type"]),
+    ("property_address", str, ["property address", "address", "property", "subject property"]),
+]
+
+# Normalized key -> (field name, priority, parser); lower priority wins
+FIELD_ALIASES: dict[str, tuple[str, int, Callable[[str], Any]]] = {
+    _norm(alias): (field_name, priority, parser)
+    for field_name, parser, aliases in _FIELD_SPECS
+    for priority, alias in enumerate(aliases)
+}
+
+
+def extract_loan_fields(analysis_result: dict[str, Any], keep_markdown: bool = True) -> LoanApplicationData:
     """
     Extract loan application fields from Content Understanding result.
 
     This function parses the analysis result and extracts relevant loan fields.
     Since we're using the prebuilt-document analyzer, we need to search for
     fields in the markdown content and key-value pairs.
+
+    Args:
+        analysis_result: Result returned by ContentUnderstandingClient.analyze_document
+        keep_markdown: Include the first 2000 characters of the document
+            markdown as ``raw_markdown``. Batch callers that only need the
+            fields can pass False to skip it.
     """
     contents = analysis_result.get("result", {}).get("contents", [])
 
     if not contents:
-        return LoanApplicationData()
+        return LoanApplicationData.model_construct()
 
     content = contents[0]
     markdown = content.get("markdown", "")
     fields = content.get("fields", {})
     kv_pairs = content.get("keyValuePairs", [])
 
-    # Build a lookup from key-value pairs
-    kv_lookup: dict[str, str] = {}
+    # Single pass over the key-value pairs, keeping the highest-priority
+    # alias seen for each field (later duplicates of the same key win)
+    best: dict[str, tuple[int, str, Callable[[str], Any]]] = {}
     for kv in kv_pairs:
-        key = kv.get("key", {}).get("content", "").lower().strip()
+        key = _norm(kv.get("key", {}).get("content", ""))
+        alias = FIELD_ALIASES.get(key)
+        if alias is None:
+            continue
         value = kv.get("value", {}).get("content", "")
-        if key and value:
-            kv_lookup[key] = value
-
-    # Extract fields using various strategies
-    extracted = LoanApplicationData(raw_markdown=markdown[:2000] if markdown else None)
-
-    # Try to find applicant name
-    for key in ["applicant name", "borrower name", "name", "full name", "applicant"]:
-        if key in kv_lookup:
-            extracted.applicant_name = kv_lookup[key]
-            break
-
-    # Try to find SSN (last 4)
-    for key in ["ssn", "social security", "social security number", "ssn (last 4)"]:
-        if key in kv_lookup:
-            ssn_value = kv_lookup[key]
-            # Extract last 4 digits
-            digits = "".join(filter(str.isdigit, ssn_value))
-            if len(digits) >= 4:
-                extracted.ssn_last_4 = digits[-4:]
-            break
-
-    # Try to find annual income
-    for key in ["annual income", "yearly income", "income", "gross income", "annual salary"]:
-        if key in kv_lookup:
-            income_str = kv_lookup[key].replace(",", "").replace("$", "")
-            try:
-                extracted.annual_income = float(income_str)
-            except ValueError:
-                pass
-            break
-
-    # Try to find employment status
-    for key in ["employment status", "employment", "work status"]:
-        if key in kv_lookup:
-            extracted.employment_status = kv_lookup[key]
-            break
-
-    # Try to find employer name
-    for key in ["employer", "employer name", "company", "current employer"]:
-        if key in kv_lookup:
-            extracted.employer_name = kv_lookup[key]
-            break
-
-    # Try to find loan amount
-    for key in ["loan amount", "amount requested", "requested amount", "loan amount requested"]:
-        if key in kv_lookup:
-            amount_str = kv_lookup[key].replace(",", "").replace("$", "")
-            try:
-                extracted.loan_amount_requested = float(amount_str)
-            except ValueError:
-                pass
-            break
-
-    # Try to find loan purpose
-    for key in ["loan purpose", "purpose", "purpose of loan", "loan type"]:
-        if key in kv_lookup:
-            extracted.loan_purpose = kv_lookup[key]
-            break
-
-    # Try to find property address
-    for key in ["property address", "address", "property", "subject property"]:
-        if key in kv_lookup:
-            extracted.property_address = kv_lookup[key]
-            break
+        if not value:
+            continue
+        field_name, priority, parser = alias
+        current = best.get(field_name)
+        if current is None or priority <= current[0]:
+            best[field_name] = (priority, value, parser)
+
+    values: dict[str, Any] = {
+        field_name: parser(value) for field_name, (_, value, parser) in best.items()
+    }
 
     # Calculate confidence score (average of available confidences)
-    confidences = []
+    total = 0.0
+    count = 0
     for field_data in fields.values():
         if isinstance(field_data, dict) and "confidence" in field_data:
-            confidences.append(field_data["confidence"])
+            total += field_data["confidence"]
+            count += 1
+
+    if count:
+        values["confidence_score"] = total / count
 
-    if confidences:
-        extracted.confidence_score = sum(confidences) / len(confidences)
+    if keep_markdown and markdown:
+        values["raw_markdown"] = markdown[:2000]
 
-    return extracted
+    # Every value above is already parsed to its field type, so skip validation
+    return LoanApplicationData.model_construct(**values)
 
 
 # ============================================================================
 # MCP Server
 # ============================================================================
 
-def create_mcp_server() -> Server:
-    """Create and configure the MCP server with Content Understanding tools."""
+@functools.lru_cache(maxsize=1)
+def get_credential() -> TokenCredential:
+    """
+    Get the process-wide Azure credential.
+
+    Azure credentials are thread-safe and meant to be reused, so the chain is
+    built only once. By default this is DefaultAzureCredential without the
+    interactive sources, since the server never runs with a user at the
+    keyboard. Set AZURE_CREDENTIAL_CHAIN=managed in hosted environments to
+    try only environment and managed identity credentials and skip probing
+    the developer tool sources.
+    """
+    if os.getenv("AZURE_CREDENTIAL_CHAIN", "").lower() == "managed":
+        from azure.identity import (
+            ChainedTokenCredential,
+            EnvironmentCredential,
+            ManagedIdentityCredential,
+        )
+
+        return ChainedTokenCredential(EnvironmentCredential(), ManagedIdentityCredential())
 
-    server = Server("content-understanding-mcp")
+    from azure.identity import DefaultAzureCredential
 
-    # Get configuration from environment
+    return DefaultAzureCredential(
+        exclude_interactive_browser_credential=True,
+        exclude_visual_studio_code_credential=True,
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_cu_client() -> ContentUnderstandingClient:
+    """
+    Get the process-wide Content Understanding client.
+
+    Built from environment configuration on first call; every MCP server in
+    the process then shares its credential, token cache and connection pool.
+    """
     endpoint = os.getenv("AZURE_AI_SERVICES_ENDPOINT")
     if not endpoint:
         logger.warning("AZURE_AI_SERVICES_ENDPOINT not set - using placeholder")
         endpoint = "https://placeholder.cognitiveservices.azure.com"
 
-    credential = DefaultAzureCredential()
-    cu_client = ContentUnderstandingClient(endpoint=endpoint, credential=credential)
+    return ContentUnderstandingClient(
+        endpoint=endpoint,
+        credential=get_credential(),
+        max_concurrency=int(os.getenv("ANALYZE_CONCURRENCY", "16")),
+        max_document_bytes=int(os.getenv("MAX_DOCUMENT_BYTES", "0")) or None,
+    )
 
-    @server.list_tools()
-    async def list_tools() -> list[Tool]:
-        """List available MCP tools."""
-        return [
-            Tool(
-                name="extract_loan_data",
-                description="""Extract structured loan application data from a document URL.
+
+# Built once; list_tools returns the same list on every request
+_TOOLS: list[Tool] = [
+    Tool(
+        name="extract_loan_data",
+        description="""Extract structured loan application data from a document URL.
 
 Extracts the following fields from loan application documents:
 - Applicant name
@@ -275,106 +560,250 @@ Extracts the following fields from loan application documents:
 
 Supports PDF, images, and Office documents.
 Provide a publicly accessible URL (e.g., raw GitHub URL, public blob URL).""",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "document_url": {
-                            "type": "string",
-                            "description": "Public URL of the loan document to analyze (e.g., https://raw.githubusercontent.com/user/repo/main/doc.pdf)",
-                        },
-                    },
-                    "required": ["document_url"],
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "document_url": {
+                    "type": "string",
+                    "description": "Public URL of the loan document to analyze (e.g., https://raw.githubusercontent.com/user/repo/main/doc.pdf)",
                 },
-            ),
-            Tool(
-                name="get_document_text",
-                description="""Extract full text/markdown content from a document URL.
+            },
+            "required": ["document_url"],
+        },
+    ),
+    Tool(
+        name="get_document_text",
+        description="""Extract full text/markdown content from a document URL.
 
 Returns the complete text content of a document in markdown format,
 useful for further analysis or summarization.
 Provide a publicly accessible URL.""",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "document_url": {
-                            "type": "string",
-                            "description": "Public URL of the document to extract text from",
-                        },
-                    },
-                    "required": ["document_url"],
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "document_url": {
+                    "type": "string",
+                    "description": "Public URL of the document to extract text from",
                 },
-            ),
+                "max_chars": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": "Optional limit on the number of characters returned",
+                },
+            },
+            "required": ["document_url"],
+        },
+    ),
+    Tool(
+        name="extract_all",
+        description="""Extract structured loan data and the full markdown text from a document URL.
+
+Runs a single document analysis and returns both the fields from
+extract_loan_data and the text from get_document_text as one JSON object
+with "loan_data" and "markdown" keys. Prefer this over calling both tools.
+Provide a publicly accessible URL.""",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "document_url": {
+                    "type": "string",
+                    "description": "Public URL of the loan document to analyze",
+                },
+            },
+            "required": ["document_url"],
+        },
+    ),
+    Tool(
+        name="extract_loan_data_batch",
+        description="""Extract structured loan application data from several document URLs at once.
+
+Analyzes the documents concurrently and returns a JSON array in input order.
+Each entry has "document_url" and either "loan_data" (the same fields as
+extract_loan_data, without raw_markdown) or "error".
+Provide publicly accessible URLs.""",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "document_urls": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": 1,
+                    "description": "Public URLs of the loan documents to analyze",
+                },
+            },
+            "required": ["document_urls"],
+        },
+    ),
+]
+
+
+def _require_url(arguments: dict[str, Any]) -> str:
+    """Return the document_url argument, raising ValueError if it is missing."""
+    if not (document_url := arguments.get("document_url")):
+        raise ValueError("document_url is required")
+    return document_url
+
+
+def create_mcp_server(cu_client: ContentUnderstandingClient | None = None) -> Server:
+    """
+    Create and configure the MCP server with Content Understanding tools.
+
+    Args:
+        cu_client: Client to use for analysis. Defaults to the shared
+            client from get_cu_client().
+    """
+
+    server = Server("content-understanding-mcp")
+
+    if cu_client is None:
+        cu_client = get_cu_client()
+
+    @server.list_tools()
+    async def list_tools() -> list[Tool]:
+        """List available MCP tools."""
+        return _TOOLS
+
+    async def extract_loan_data(arguments: dict[str, Any]) -> list[TextContent]:
+        document_url = _require_url(arguments)
+        logger.info("Extracting loan data from URL: %s", document_url)
+        result = await cu_client.analyze_document(document_url)
+        loan_data = cu_client.loan_fields(document_url, result)
+        return [
+            TextContent(
+                type="text",
+                text=loan_data.model_dump_json(
+                    exclude_none=True, indent=2 if _PRETTY_JSON else None
+                ),
+            )
+        ]
+
+    async def get_document_text(arguments: dict[str, Any]) -> list[TextContent]:
+        document_url = _require_url(arguments)
+        logger.info("Extracting text from URL: %s", document_url)
+        result = await cu_client.analyze_document(document_url)
+        contents = result.get("result", {}).get("contents", [])
+
+        if contents:
+            markdown = contents[0].get("markdown", "")
+            if max_chars := arguments.get("max_chars"):
+                markdown = markdown[:max_chars]
+            return [TextContent(type="text", text=markdown)]
+        return [TextContent(type="text", text="No content extracted from document")]
+
+    async def extract_all(arguments: dict[str, Any]) -> list[TextContent]:
+        document_url = _require_url(arguments)
+        logger.info("Extracting loan data and text from URL: %s", document_url)
+        result = await cu_client.analyze_document(document_url)
+        loan_data = cu_client.loan_fields(document_url, result, keep_markdown=False)
+        contents = result.get("result", {}).get("contents", [])
+        markdown = contents[0].get("markdown", "") if contents else ""
+
+        return [
+            TextContent(
+                type="text",
+                text=orjson.dumps(
+                    {
+                        "loan_data": loan_data.model_dump(exclude_none=True),
+                        "markdown": markdown,
+                    },
+                    option=_JSON_OPTION,
+                ).decode(),
+            )
         ]
 
+    async def extract_loan_data_batch(arguments: dict[str, Any]) -> list[TextContent]:
+        if not (document_urls := arguments.get("document_urls")):
+            raise ValueError("document_urls is required")
+        logger.info("Extracting loan data from %d documents", len(document_urls))
+
+        # Concurrency is bounded by the client's semaphore; duplicate URLs
+        # share a single analysis
+        results = await asyncio.gather(
+            *(cu_client.analyze_document(url) for url in document_urls),
+            return_exceptions=True,
+        )
+
+        entries = []
+        for url, result in zip(document_urls, results):
+            if isinstance(result, BaseException):
+                entries.append({"document_url": url, "error": str(result)})
+            else:
+                loan_data = cu_client.loan_fields(url, result, keep_markdown=False)
+                entries.append(
+                    {"document_url": url, "loan_data": loan_data.model_dump(exclude_none=True)}
+                )
+
+        return [TextContent(type="text", text=orjson.dumps(entries, option=_JSON_OPTION).decode())]
+
+    handlers: dict[str, Callable[[dict[str, Any]], Awaitable[list[TextContent]]]] = {
+        "extract_loan_data": extract_loan_data,
+        "get_document_text": get_document_text,
+        "extract_all": extract_all,
+        "extract_loan_data_batch": extract_loan_data_batch,
+    }
+
     @server.call_tool()
     async def call_tool(name: str, arguments: dict[str, Any]) -> list[TextContent]:
         """Handle tool invocations."""
-
-        if name == "extract_loan_data":
-            document_url = arguments.get("document_url")
-
-            if not document_url:
-                return [TextContent(type="text", text="Error: document_url is required")]
-
-            try:
-                logger.info(f"Extracting loan data from URL: {document_url}")
-                result = await cu_client.analyze_document(document_url)
-                loan_data = extract_loan_fields(result)
-
-                # Return as formatted JSON
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(loan_data.model_dump(exclude_none=True), indent=2),
-                    )
-                ]
-            except Exception as e:
-                logger.error(f"Error extracting loan data: {e}")
-                return [TextContent(type="text", text=f"Error: {str(e)}")]
-
-        elif name == "get_document_text":
-            document_url = arguments.get("document_url")
-
-            if not document_url:
-                return [TextContent(type="text", text="Error: document_url is required")]
-
-            try:
-                logger.info(f"Extracting text from URL: {document_url}")
-                result = await cu_client.analyze_document(document_url)
-                contents = result.get("result", {}).get("contents", [])
-
-                if contents:
-                    markdown = contents[0].get("markdown", "")
-                    return [TextContent(type="text", text=markdown)]
-                else:
-                    return [TextContent(type="text", text="No content extracted from document")]
-
-            except Exception as e:
-                logger.error(f"Error extracting document text: {e}")
-                return [TextContent(type="text", text=f"Error: {str(e)}")]
-
-        else:
+        handler = handlers.get(name)
+        if handler is None:
             return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
+        try:
+            return await handler(arguments)
+        except Exception as e:
+            logger.error("Error in %s: %s", name, e)
+            return [TextContent(type="text", text=f"Error: {str(e)}")]
+
     return server
 
 
-async def main():
-    """Run the MCP server using stdio transport."""
+async def serve_stdio(server_factory: Callable[[], Server] = create_mcp_server) -> None:
+    """
+    Serve an MCP server over stdio until the client disconnects.
+
+    Loads .env and configures logging first, then calls ``server_factory``
+    so the server sees the loaded environment. The shared Content
+    Understanding client and credential are closed on the way out.
+    """
     from dotenv import load_dotenv
 
     load_dotenv()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 
     logger.info("Starting Content Understanding MCP Server...")
-    server = create_mcp_server()
+    server = server_factory()
 
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options(),
-        )
+    from mcp.server.stdio import stdio_server
+
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options(),
+            )
+    finally:
+        # Close pooled connections and credential sessions before the loop goes away
+        await get_cu_client().aclose()
+        get_credential().close()
+
+
+def run(main: Callable[[], Coroutine[Any, Any, None]]) -> None:
+    """Run an async entry point, on uvloop when it is installed."""
+    # uvloop ships with uvicorn[standard] on non-Windows platforms
+    try:
+        from uvloop import new_event_loop as loop_factory
+    except ImportError:
+        loop_factory = None
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(main())
+
+
+async def main():
+    """Run the MCP server using stdio transport."""
+    await serve_stdio()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main)
@@ -5,31 +5,24 @@ Run this for local testing with MCP Inspector.
 Uses stdio transport which MCP Inspector supports natively.
 """
 
-import asyncio
 import logging
+from functools import lru_cache
 
-from dotenv import load_dotenv
-from mcp.server.stdio import stdio_server
+from .mcp_server import create_mcp_server, run, serve_stdio
 
-from .mcp_server import create_mcp_server
-
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def _cached_server():
+    """Build the MCP server once per process."""
+    return create_mcp_server()
+
+
 async def main():
     """Run the MCP server with stdio transport."""
-    load_dotenv()
-    
-    server = create_mcp_server()
-    
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options(),
-        )
+    await serve_stdio(_cached_server)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main)